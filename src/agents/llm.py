@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import functools
+
+from langchain_openai import ChatOpenAI
+
+
+@functools.lru_cache(maxsize=8)
+def get_llm(model: str = "gpt-4o-mini", temperature: float = 0.0) -> ChatOpenAI:
+    """Shared ChatOpenAI per (model, temperature).
+
+    Reusing the instance keeps its HTTP connection pool warm across crews instead
+    of paying for a new client and TLS handshake on every factory call.
+    """
+
+    return ChatOpenAI(model=model, temperature=temperature)
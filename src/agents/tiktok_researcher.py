@@ -5,7 +5,8 @@ from typing import Optional, Sequence
 from crewai import Agent
 from langchain_openai import ChatOpenAI
 
-from src.tools import TikTokHashtagScrapeTool
+from src.agents.llm import get_llm
+from src.tools import hashtag_scrape_tool
 
 
 def create_tiktok_researcher(
@@ -18,14 +19,14 @@ def create_tiktok_researcher(
     """Factory for a reusable TikTok researcher Agent.
 
     Parameters:
-      - llm: Optional ChatOpenAI instance. If not provided, one is created.
-      - tools: Optional custom tools. If not provided, uses TikTokHashtagScrapeTool().
+      - llm: Optional ChatOpenAI instance. If not provided, a shared one is reused.
+      - tools: Optional custom tools. If not provided, uses the shared scrape tool.
       - temperature: Generation temperature for default LLM.
       - model: Model name for default LLM.
     """
 
-    the_llm = llm or ChatOpenAI(model=model, temperature=temperature)
-    the_tools = list(tools) if tools is not None else [TikTokHashtagScrapeTool()]
+    the_llm = llm or get_llm(model, temperature)
+    the_tools = list(tools) if tools is not None else [hashtag_scrape_tool]
 
     return Agent(
         role="TikTok Research Analyst",
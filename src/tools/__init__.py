@@ -0,0 +1,3 @@
+from src.tools.tiktok_scrape_tool import TikTokHashtagScrapeTool, hashtag_scrape_tool
+
+__all__ = ["TikTokHashtagScrapeTool", "hashtag_scrape_tool"]
@@ -0,0 +1,289 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import os
+import time
+import random
+import asyncio
+import weakref
+import threading
+import aiohttp
+import ijson
+import orjson
+
+APIFY_API_URL = "https://api.apify.com/v2"
+
+# Read the dataset body in 64 KiB chunks and feed them to the incremental parser
+DATASET_CHUNK_SIZE = 64 * 1024
+
+# Statuses worth retrying: rate limiting and transient server-side failures
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# A non-idempotent request (starting a billable actor run) may already have been
+# applied after a 5xx or a lost response, so it is only retried when it certainly
+# was not: rate limited, or the connection could not be opened
+UNAPPLIED_STATUSES = frozenset({429})
+
+TRANSIENT_ERRORS: Tuple[type[BaseException], ...] = (
+    aiohttp.ClientConnectionError,
+    asyncio.TimeoutError,
+)
+UNSENT_ERRORS: Tuple[type[BaseException], ...] = (aiohttp.ClientConnectorError,)
+
+T = TypeVar("T")
+
+
+class ApifyApiError(RuntimeError):
+    """Non-2xx response from the Apify REST API."""
+
+    def __init__(
+        self, status_code: int, message: str, *, retry_after: Optional[float] = None
+    ) -> None:
+        super().__init__(f"Apify API error {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+async def _api_error(resp: aiohttp.ClientResponse) -> ApifyApiError:
+    retry_after: Optional[float] = None
+    header = resp.headers.get("Retry-After")
+    if header:
+        try:
+            retry_after = float(header)
+        except ValueError:
+            # HTTP-date form; fall back to our own backoff schedule
+            retry_after = None
+    return ApifyApiError(resp.status, await resp.text(), retry_after=retry_after)
+
+
+async def retry_with_backoff(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    statuses: FrozenSet[int] = RETRYABLE_STATUSES,
+    errors: Tuple[type[BaseException], ...] = TRANSIENT_ERRORS,
+) -> T:
+    """Await fn(), retrying transient Apify failures with exponential backoff and jitter.
+
+    Retries API errors with one of statuses and the given transport errors. Honors
+    the Retry-After header when the API sends one.
+    """
+
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except ApifyApiError as e:
+            if e.status_code not in statuses or attempt >= max_retries:
+                raise
+            delay = e.retry_after
+        except errors:
+            if attempt >= max_retries:
+                raise
+            delay = None
+
+        if delay is None:
+            delay = base_delay * 2**attempt + random.uniform(0, base_delay)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+class ApifyRateLimitedClient:
+    """Apify REST client that caps concurrent requests, throttles and retries them.
+
+    At most max_concurrent requests are in flight at once and request starts are
+    spaced at least min_delay_ms apart. The client can be shared across event loops
+    and threads (e.g. successive asyncio.run calls); each loop gets its own
+    semaphore, so the concurrency cap applies per event loop, while the request
+    spacing is shared by all of them.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        *,
+        max_concurrent: int = 5,
+        min_delay_ms: int = 100,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+    ) -> None:
+        self._token = token
+        self.max_concurrent = max_concurrent
+        self.min_delay = min_delay_ms / 1000
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+        # Guards _semaphores and _next_start, which are touched from several threads
+        self._lock = threading.Lock()
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+        self._next_start = 0.0
+
+    @property
+    def token(self) -> str:
+        # Resolved lazily so the token can still be provided after import (e.g. CLI flag)
+        token = self._token or os.getenv("APIFY_API_TOKEN")
+        if not token:
+            raise RuntimeError(
+                "APIFY_API_TOKEN is not set. Please set it in your environment or .env file."
+            )
+        return token
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(
+                    self.max_concurrent
+                )
+            return semaphore
+
+    async def throttle(self) -> asyncio.Semaphore:
+        """Acquire a concurrency slot and wait out the minimum delay between requests.
+
+        Returns the semaphore that was acquired; the caller must release that one.
+        """
+
+        semaphore = self._loop_semaphore()
+        await semaphore.acquire()
+        try:
+            # Reserve the next start slot, then sleep until it comes up
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self.min_delay
+            if start > now:
+                await asyncio.sleep(start - now)
+        except BaseException:
+            semaphore.release()
+            raise
+        return semaphore
+
+    async def _request_data(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        path: str,
+        *,
+        idempotent: bool = True,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        async def attempt() -> Dict[str, Any]:
+            semaphore = await self.throttle()
+            try:
+                async with session.request(
+                    method, f"{APIFY_API_URL}{path}", headers=self._headers(), **kwargs
+                ) as resp:
+                    if resp.status >= 400:
+                        raise await _api_error(resp)
+                    return (await resp.json(loads=orjson.loads))["data"]
+            finally:
+                semaphore.release()
+
+        return await retry_with_backoff(
+            attempt,
+            max_retries=self.max_retries,
+            base_delay=self.base_delay,
+            statuses=RETRYABLE_STATUSES if idempotent else UNAPPLIED_STATUSES,
+            errors=TRANSIENT_ERRORS if idempotent else UNSENT_ERRORS,
+        )
+
+    async def start_run(
+        self, session: aiohttp.ClientSession, actor_id: str, run_input: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        # Retrying after the POST may have reached Apify would start a second run
+        return await self._request_data(
+            session, "POST", f"/acts/{actor_id}/runs", idempotent=False, json=run_input
+        )
+
+    async def wait_for_run(
+        self,
+        session: aiohttp.ClientSession,
+        run_id: str,
+        *,
+        initial_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ) -> Dict[str, Any]:
+        """Poll an actor run with exponential backoff until it reaches a terminal state."""
+
+        delay = initial_delay
+        while True:
+            run = await self._request_data(session, "GET", f"/actor-runs/{run_id}")
+
+            status = run.get("status")
+            if status == "SUCCEEDED":
+                return run
+            if status in ("FAILED", "ABORTED", "TIMED-OUT"):
+                raise RuntimeError(f"Apify run {run_id} finished with status {status}")
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    async def iter_dataset_items(
+        self,
+        session: aiohttp.ClientSession,
+        dataset_id: str,
+        *,
+        fields: Optional[Iterable[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream dataset items, parsing the JSON array incrementally as chunks arrive.
+
+        If fields is given, Apify strips every other field server-side.
+
+        Only opening the response is retried; once items have been yielded a failure
+        propagates, since replaying the stream would duplicate them.
+        """
+
+        url = f"{APIFY_API_URL}/datasets/{dataset_id}/items"
+        params = {"format": "json", "clean": "1"}
+        if fields is not None:
+            params["fields"] = ",".join(sorted(fields))
+
+        async def open_stream() -> Tuple[aiohttp.ClientResponse, asyncio.Semaphore]:
+            semaphore = await self.throttle()
+            try:
+                resp = await session.get(url, params=params, headers=self._headers())
+                if resp.status >= 400:
+                    try:
+                        raise await _api_error(resp)
+                    finally:
+                        resp.release()
+            except BaseException:
+                semaphore.release()
+                raise
+            return resp, semaphore
+
+        resp, semaphore = await retry_with_backoff(
+            open_stream, max_retries=self.max_retries, base_delay=self.base_delay
+        )
+        try:
+            events = ijson.sendable_list()
+            parser = ijson.items_coro(events, "item", use_float=True)
+            async for chunk in resp.content.iter_chunked(DATASET_CHUNK_SIZE):
+                parser.send(chunk)
+                for item in events:
+                    yield item
+                del events[:]
+            parser.close()
+            for item in events:
+                yield item
+        finally:
+            resp.release()
+            semaphore.release()
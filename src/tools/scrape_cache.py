@@ -0,0 +1,153 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional
+
+import os
+import time
+import functools
+import msgspec
+import redis
+import zstandard
+
+# One Redis hash per results_per_page bucket, one field per hashtag, to avoid
+# paying per-key overhead for every cached hashtag
+CACHE_KEY_PREFIX = "tiktok:videos:"
+
+# Scraped items go stale quickly; one hour keeps repeated topic sets cheap
+DEFAULT_TTL = 3600
+
+# Buckets are also split into fixed time windows so whole hashes expire; an entry
+# lives in the window it was written in, so ttl cannot exceed one window
+BUCKET_WINDOW = DEFAULT_TTL
+
+ZSTD_LEVEL = 3
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compression_enabled() -> bool:
+    """Whether cached payloads and result files are zstd-compressed.
+
+    On by default; set COMPRESS_RESULTS=0 to store plain JSON for debugging.
+    """
+
+    return os.getenv("COMPRESS_RESULTS", "1").strip().lower() not in ("0", "false", "no")
+
+
+class _Entry(msgspec.Struct):
+    """One cached hashtag: its scraped items and when they stop being fresh."""
+
+    expires_at: float
+    items: List[Dict[str, Any]]
+
+
+_ENTRY_DEC = msgspec.json.Decoder(_Entry)
+
+
+def _encode(entry: _Entry) -> bytes:
+    data = msgspec.json.encode(entry)
+    return zstandard.compress(data, ZSTD_LEVEL) if compression_enabled() else data
+
+
+def _decode(value: bytes) -> Optional[_Entry]:
+    try:
+        # Entries may have been written with compression on or off, so sniff the frame
+        if value.startswith(_ZSTD_MAGIC):
+            value = zstandard.decompress(value)
+        return _ENTRY_DEC.decode(value)
+    except (zstandard.ZstdError, msgspec.DecodeError):
+        # Corrupt, truncated or in an older format; treat as a miss
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _redis() -> Optional[redis.Redis]:
+    """Lazily connect to REDIS_URL. Caching is disabled when it is not set."""
+
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    return redis.Redis.from_url(url)
+
+
+def _window(now: float) -> int:
+    return int(now // BUCKET_WINDOW)
+
+
+def bucket_key(results_per_page: int, window: int) -> str:
+    """Hash holding the hashtags scraped with this results_per_page in a window."""
+
+    return f"{CACHE_KEY_PREFIX}rpp={results_per_page}:w={window}"
+
+
+def _field(hashtag: str) -> str:
+    return hashtag.lower()
+
+
+def get_cached(
+    hashtags: Iterable[str], results_per_page: int
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Return cached items for the hashtags that have them.
+
+    Entries written during the previous window may still be fresh, so both the
+    current and the previous bucket are read, in a single round trip.
+    """
+
+    client = _redis()
+    tags = list(hashtags)
+    if client is None or not tags:
+        return {}
+    now = time.time()
+    window = _window(now)
+    fields = [_field(t) for t in tags]
+    pipe = client.pipeline(transaction=False)
+    pipe.hmget(bucket_key(results_per_page, window), fields)
+    pipe.hmget(bucket_key(results_per_page, window - 1), fields)
+    try:
+        current, previous = pipe.execute()
+    except redis.RedisError:
+        # The cache is an optimization; never fail a scrape because of it
+        return {}
+
+    hits: Dict[str, List[Dict[str, Any]]] = {}
+    for tag, *values in zip(tags, current, previous):
+        for value in values:
+            if value is None:
+                continue
+            entry = _decode(value)
+            if entry is not None and entry.expires_at > now:
+                hits[tag] = entry.items
+                break
+    return hits
+
+
+def set_cached(
+    entries: Dict[str, List[Any]],
+    results_per_page: int,
+    *,
+    ttl: int = DEFAULT_TTL,
+) -> None:
+    """Store each hashtag's items as a field of the current window's bucket.
+
+    Each field records its own deadline, which get_cached checks, while Redis
+    drops the whole bucket once nothing in it can still be fresh. ttl is capped
+    at BUCKET_WINDOW.
+    """
+
+    client = _redis()
+    if client is None or not entries:
+        return
+    now = time.time()
+    expires_at = now + min(ttl, BUCKET_WINDOW)
+    mapping = {
+        _field(tag): _encode(_Entry(expires_at, items))
+        for tag, items in entries.items()
+    }
+    window = _window(now)
+    key = bucket_key(results_per_page, window)
+    pipe = client.pipeline(transaction=False)
+    pipe.hset(key, mapping=mapping)
+    # Every field written during this window has expired by the end of the next one
+    pipe.expireat(key, (window + 2) * BUCKET_WINDOW)
+    try:
+        pipe.execute()
+    except redis.RedisError:
+        pass
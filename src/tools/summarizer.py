@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import re
+
+_URL = re.compile(r"https?://\S+")
+# Sigils only count at the start of a word, so "me@x.com" is left alone
+_TAG_OR_MENTION = re.compile(r"(?<!\S)[#@]([^\s#@]+)")
+# The block of hashtags/mentions TikTok captions usually end with
+_TRAILING_TAGS = re.compile(r"(?<!\S)(?:[#@][^\s#@]+\s*)+$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Summaries end up in the LLM prompt; keep them to roughly two short sentences
+MAX_SUMMARY_CHARS = 200
+
+
+def _trailing_tags(text: str) -> Optional[re.Match[str]]:
+    match = _TRAILING_TAGS.search(text)
+    if match is None:
+        return None
+    # A single final tag may still be part of the sentence ("I love #cats"); it is
+    # only dropped after sentence-ending punctuation or when nothing precedes it
+    before = text[: match.start()].rstrip()
+    if len(match.group().split()) >= 2 or not before or before[-1] in ".!?":
+        return match
+    return None
+
+
+def summarize(text: str, *, max_sentences: int = 2) -> str:
+    """Extractive 1-2 sentence summary of a TikTok caption.
+
+    Drops URLs and the trailing block of hashtags/mentions (two or more tags, or
+    any after the final sentence), keeps inline ones as plain words
+    ("I love #cats and #dogs" -> "I love cats and dogs"), then keeps the leading
+    sentences and truncates on a word boundary. A caption made only of tags falls
+    back to the tag words. Returns "" when the caption is empty.
+    """
+
+    text = _URL.sub("", text)
+    trailing = _trailing_tags(text)
+    body = text[: trailing.start()] if trailing else text
+
+    cleaned = " ".join(_TAG_OR_MENTION.sub(r"\1", body).split())
+    if not cleaned and trailing:
+        cleaned = " ".join(_TAG_OR_MENTION.findall(trailing.group()))
+    if not cleaned:
+        return ""
+
+    summary = " ".join(_SENTENCE_END.split(cleaned)[:max_sentences])
+    if len(summary) > MAX_SUMMARY_CHARS:
+        summary = summary[:MAX_SUMMARY_CHARS].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+    return summary
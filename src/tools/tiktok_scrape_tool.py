@@ -1,91 +1,520 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+)
 
 import os
-import json
-from apify_client import ApifyClient
+import time
+import atexit
+import heapq
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+import aiohttp
+import msgspec
+import orjson
+import zstandard
 from crewai_tools import BaseTool
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, create_model
 from dotenv import load_dotenv
 
+from src.tools.apify_api import ApifyRateLimitedClient
+from src.tools.scrape_cache import (
+    DEFAULT_TTL,
+    ZSTD_LEVEL,
+    compression_enabled,
+    get_cached,
+    set_cached,
+)
+from src.tools.summarizer import summarize
+
 load_dotenv()
 
+# How many items per hashtag (ranked by likes) the CrewAI tool forwards to the agent
+DEFAULT_TOP_K = 5
 
-class TikTokHashtagScrapeInput(BaseModel):
-    """Input schema for TikTok hashtag scraping."""
+TIKTOK_ACTOR_ID = "GdWCkxBtKWOsKjdch"
+
+# Dataset fields Video.from_item reads; everything else is filtered out by Apify
+DEFAULT_FIELDS = frozenset(
+    {"id", "webVideoUrl", "hashtags", "playCount", "diggCount", "authorMeta", "text"}
+)
+
+# Shared by every scrape in the process so concurrency and throttling are global
+_APIFY = ApifyRateLimitedClient()
+
+# aiohttp session owned by _io_loop(); only ever touched from that loop's thread
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+# In-process dedup of tool scrapes: (hashtags, rpp, top_k) -> (deadline, result)
+_DEDUP_TTL = 60.0
+_DEDUP_MAXSIZE = 32
+_DEDUP: OrderedDict[
+    Tuple[FrozenSet[str], int, int], Tuple[float, Dict[str, Tuple[Video, ...]]]
+] = OrderedDict()
+_DEDUP_LOCK = threading.Lock()
 
-    hashtags: List[str] = Field(
-        ..., description="List of hashtags to scrape (without the leading #)."
-    )
-    results_per_page: int = Field(
-        10, ge=1, le=50, description="How many results per page to fetch from Apify."
-    )
 
-    @validator("hashtags", pre=True)
-    def normalize_hashtags(cls, v):  # type: ignore[no-untyped-def]
-        # Accept a comma-separated string or a list; strip leading '#'
-        if isinstance(v, str):
-            v = [h.strip() for h in v.split(",") if h.strip()]
-        if isinstance(v, list):
-            return [str(h).strip().lstrip("#") for h in v if str(h).strip()]
+def normalize_hashtags(v: Any) -> List[str]:
+    """Normalize hashtags in a single pass.
+
+    Accepts a comma-separated string or a list. Strips whitespace and the leading
+    '#', lower-cases, drops anything that is not letters/numbers only, and removes
+    duplicates while keeping the first occurrence's position.
+    """
+
+    if isinstance(v, str):
+        v = v.split(",")
+    elif not isinstance(v, (list, tuple)):
         raise ValueError("hashtags must be a list or comma-separated string")
 
+    seen = set()
+    out: List[str] = []
+    for h in v:
+        tag = str(h).strip().lstrip("#").lower()
+        if tag and tag.isalnum() and tag not in seen:
+            seen.add(tag)
+            out.append(tag)
+    return out
 
-def tiktok_scrape_tool(
-    hashtags: List[str], *, results_per_page: int = 10, write_to_file: bool = False
-) -> Dict[str, Any]:
-    """Scrape TikTok by hashtags via Apify and return the aggregated results.
 
-    Parameters:
-        hashtags: list of hashtags (without '#').
-        results_per_page: number of results per page.
-        write_to_file: if True, writes the JSON result to result.json.
+_HASHTAGS_DESCRIPTION = (
+    "List of hashtags to scrape (without the leading #), or a comma-separated string."
+)
+_RESULTS_PER_PAGE_DESCRIPTION = "How many results per page to fetch from Apify."
+_TOP_K_DESCRIPTION = "How many of the most-liked videos to return per hashtag."
+
 
-    Returns:
-        Dict with a single key "data" containing the list of scraped items.
+class TikTokHashtagScrapeInput(msgspec.Struct):
+    """Input schema for TikTok hashtag scraping.
+
+    Validated by msgspec; __post_init__ normalizes hashtags, so an instance always
+    holds a non-empty, deduplicated list of letters/numbers-only tags.
     """
 
-    token = os.getenv("APIFY_API_TOKEN")
-    if not token:
-        raise RuntimeError(
-            "APIFY_API_TOKEN is not set. Please set it in your environment or .env file."
+    hashtags: Annotated[
+        Union[List[str], str], msgspec.Meta(description=_HASHTAGS_DESCRIPTION)
+    ]
+    results_per_page: Annotated[
+        int, msgspec.Meta(ge=1, le=50, description=_RESULTS_PER_PAGE_DESCRIPTION)
+    ] = 10
+    top_k: Annotated[
+        int, msgspec.Meta(ge=1, le=50, description=_TOP_K_DESCRIPTION)
+    ] = DEFAULT_TOP_K
+
+    def __post_init__(self) -> None:
+        tags = normalize_hashtags(self.hashtags)
+        if not tags:
+            raise ValueError(
+                "hashtags must contain at least one letters/numbers-only tag"
+            )
+        self.hashtags = tags
+
+
+def _pydantic_mirror(name: str, struct_type: type[msgspec.Struct]) -> type[BaseModel]:
+    """Build a pydantic model from a Struct's JSON schema for CrewAI's args_schema.
+
+    Defaults, bounds and descriptions all come from the Struct, so the two cannot
+    drift apart; validation still happens in msgspec.
+    """
+
+    schema = msgspec.json.schema(struct_type)
+    properties = schema["$defs"][struct_type.__name__]["properties"]
+    fields: Dict[str, Any] = {}
+    for f in msgspec.structs.fields(struct_type):
+        prop = properties[f.encode_name]
+        # Drop the msgspec.Meta annotation; its constraints move into Field below
+        annotation = get_args(f.type)[0] if get_origin(f.type) is Annotated else f.type
+        fields[f.name] = (
+            annotation,
+            Field(
+                ... if f.required else f.default,
+                ge=prop.get("minimum"),
+                le=prop.get("maximum"),
+                description=prop.get("description"),
+            ),
         )
+    return create_model(name, **fields)
+
 
-    # Initialize the ApifyClient with your API token
-    client = ApifyClient(token)
+# Only used for CrewAI's schema
+TikTokHashtagScrapeArgs = _pydantic_mirror(
+    "TikTokHashtagScrapeArgs", TikTokHashtagScrapeInput
+)
 
-    # Prepare the Actor input
-    run_input = {
+
+class Video(msgspec.Struct, frozen=True, gc=False):
+    """The subset of an Apify TikTok item that the research tasks use.
+
+    A compact, immutable record; gc=False is safe since it only holds scalars.
+    """
+
+    id: str
+    url: str
+    hashtags: Tuple[str, ...]
+    views: int
+    likes: int
+    username: str
+    nickname: Optional[str]
+    followers: Optional[int]
+    text: str
+    summary: str = ""
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "Video":
+        author = item.get("authorMeta") or {}
+        text = item.get("text") or ""
+        return cls(
+            id=str(item.get("id", "")),
+            url=item.get("webVideoUrl") or "",
+            hashtags=tuple(
+                h if isinstance(h, str) else h.get("name", "")
+                for h in item.get("hashtags") or ()
+            ),
+            views=int(item.get("playCount") or 0),
+            likes=int(item.get("diggCount") or 0),
+            username=author.get("name") or "",
+            nickname=author.get("nickName"),
+            followers=author.get("fans"),
+            text=text,
+            summary=summarize(text),
+        )
+
+
+def _build_run_input(hashtags: List[str], results_per_page: int) -> Dict[str, Any]:
+    # Only hashtag scraping is used; every download stage is explicitly disabled
+    return {
         "hashtags": hashtags,
         "resultsPerPage": results_per_page,
-        "profileScrapeSections": ["videos"],
-        "profileSorting": "latest",
-        "excludePinnedPosts": False,
-        "searchSection": "",
-        "maxProfilesPerQuery": 10,
         "scrapeRelatedVideos": False,
         "shouldDownloadVideos": False,
         "shouldDownloadCovers": False,
-        "shouldDownloadSubtitles": True,
+        "shouldDownloadSubtitles": False,
         "shouldDownloadSlideshowImages": False,
         "shouldDownloadAvatars": False,
         "shouldDownloadMusicCovers": False,
         "proxyCountryCode": "None",
     }
 
-    # Run the Actor and wait for it to finish
-    run = client.actor("GdWCkxBtKWOsKjdch").call(run_input=run_input)
 
-    # Fetch Actor results from the run's dataset (if there are any)
-    res: Dict[str, Any] = {"data": []}
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        res["data"].append(item)
+async def iter_tiktok_items_async(
+    hashtags: List[str],
+    *,
+    results_per_page: int = 10,
+    session: aiohttp.ClientSession,
+    fields: Iterable[str] = DEFAULT_FIELDS,
+) -> AsyncIterator[Video]:
+    """Run the TikTok actor for the given hashtags and stream its dataset items.
+
+    Apify only sends the requested dataset fields, and each item is projected to a
+    Video as soon as it is parsed.
+    """
 
-    if write_to_file:
-        with open("result.json", "w", encoding="utf-8") as f:
-            json.dump(res, f, ensure_ascii=False, indent=2)
+    run_input = _build_run_input(hashtags, results_per_page)
+    run = await _APIFY.start_run(session, TIKTOK_ACTOR_ID, run_input)
+    run = await _APIFY.wait_for_run(session, run["id"])
+    async for item in _APIFY.iter_dataset_items(
+        session, run["defaultDatasetId"], fields=fields
+    ):
+        yield Video.from_item(item)
 
-    return res
+
+async def _scrape_hashtag(
+    hashtag: str, *, results_per_page: int, session: aiohttp.ClientSession
+) -> List[Video]:
+    # One actor run per hashtag; the dataset holds at most results_per_page items
+    return [
+        item
+        async for item in iter_tiktok_items_async(
+            [hashtag], results_per_page=results_per_page, session=session
+        )
+    ]
+
+
+async def tiktok_scrape_tool_async(
+    hashtags: List[str],
+    *,
+    results_per_page: int = 10,
+    top_k: int = DEFAULT_TOP_K,
+    ttl: int = DEFAULT_TTL,
+    bypass_cache: bool = False,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Dict[str, List[Video]]:
+    """Scrape TikTok by hashtags and return the top_k items by likes for each hashtag.
+
+    Hashtags already in the Redis cache are served from it; the remaining ones are
+    scraped concurrently, one actor run each, and cached for ttl seconds. Pass a
+    shared session to reuse its connection pool across calls.
+    """
+
+    if session is None:
+        async with aiohttp.ClientSession() as own_session:
+            return await tiktok_scrape_tool_async(
+                hashtags,
+                results_per_page=results_per_page,
+                top_k=top_k,
+                ttl=ttl,
+                bypass_cache=bypass_cache,
+                session=own_session,
+            )
+
+    per_tag: Dict[str, List[Video]] = {}
+    if not bypass_cache:
+        cached = await asyncio.to_thread(get_cached, hashtags, results_per_page)
+        per_tag = {
+            tag: msgspec.convert(records, List[Video])
+            for tag, records in cached.items()
+        }
+
+    misses = [tag for tag in hashtags if tag not in per_tag]
+    # Let every scrape finish so the successful ones are cached even if one fails
+    scraped = await asyncio.gather(
+        *(
+            _scrape_hashtag(tag, results_per_page=results_per_page, session=session)
+            for tag in misses
+        ),
+        return_exceptions=True,
+    )
+    fresh = {
+        tag: videos
+        for tag, videos in zip(misses, scraped)
+        if not isinstance(videos, BaseException)
+    }
+    await asyncio.to_thread(set_cached, fresh, results_per_page, ttl=ttl)
+    for error in scraped:
+        if isinstance(error, BaseException):
+            raise error
+    per_tag.update(fresh)
+
+    return {tag: top_by_likes(per_tag[tag], top_k) for tag in hashtags}
+
+
+def _iterate_sync(agen: AsyncIterator[Video]) -> Iterator[Video]:
+    """Drive an async iterator from synchronous code on a private event loop."""
+
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(agen.aclose())  # type: ignore[attr-defined]
+        loop.close()
+
+
+def tiktok_scrape_tool(
+    hashtags: List[str],
+    *,
+    results_per_page: int = 10,
+    write_to_file: bool = False,
+    ttl: int = DEFAULT_TTL,
+    bypass_cache: bool = False,
+) -> Iterator[Video]:
+    """Scrape TikTok by hashtags via Apify and yield the scraped items one by one.
+
+    Items are streamed from the runs' datasets instead of being buffered, so callers
+    can start processing before the whole dataset has been read. Cached hashtags
+    are yielded first; the rest are scraped concurrently, one actor run each, and
+    their items are yielded in arrival order. If a run fails, the other hashtags
+    are still streamed and cached before the error is raised.
+
+    Parameters:
+        hashtags: list of hashtags (without '#').
+        results_per_page: number of results per page.
+        write_to_file: if True, also streams the items as NDJSON (one JSON object
+            per line) to result.json.zst, zstd-compressed, or to plain result.json
+            when COMPRESS_RESULTS=0.
+        ttl: seconds to keep freshly scraped hashtags in the cache (at most an hour).
+        bypass_cache: if True, always scrape (results are still cached).
+
+    Yields:
+        Videos projected from the dataset items returned by the Apify actor.
+    """
+
+    async def _scrape_into(
+        queue: "asyncio.Queue[Optional[Video]]",
+        tag: str,
+        session: aiohttp.ClientSession,
+    ) -> None:
+        items: List[Video] = []
+        try:
+            async for item in iter_tiktok_items_async(
+                [tag], results_per_page=results_per_page, session=session
+            ):
+                items.append(item)
+                queue.put_nowait(item)
+            await asyncio.to_thread(set_cached, {tag: items}, results_per_page, ttl=ttl)
+        finally:
+            # None marks this hashtag as done, whether it succeeded or not
+            queue.put_nowait(None)
+
+    async def _stream() -> AsyncIterator[Video]:
+        cached = {} if bypass_cache else get_cached(hashtags, results_per_page)
+        for tag in hashtags:
+            if tag in cached:
+                for video in msgspec.convert(cached[tag], List[Video]):
+                    yield video
+
+        misses = [tag for tag in hashtags if tag not in cached]
+        if not misses:
+            return
+
+        # Start every missing hashtag at once and yield items from whichever run
+        # produces them first; each hashtag is cached as soon as its run finishes
+        queue: asyncio.Queue[Optional[Video]] = asyncio.Queue()
+        async with aiohttp.ClientSession() as session:
+            tasks = [
+                asyncio.create_task(_scrape_into(queue, tag, session)) for tag in misses
+            ]
+            try:
+                running = len(tasks)
+                while running:
+                    item = await queue.get()
+                    if item is None:
+                        running -= 1
+                    else:
+                        yield item
+            finally:
+                for task in tasks:
+                    task.cancel()
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+        for error in results:
+            if isinstance(error, BaseException):
+                raise error
+
+    items = _iterate_sync(_stream())
+    if not write_to_file:
+        yield from items
+        return
+
+    compress = compression_enabled()
+    with open("result.json.zst" if compress else "result.json", "wb") as raw:
+        f = (
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+            if compress
+            else raw
+        )
+        with f:
+            for item in items:
+                f.write(msgspec.json.encode(item))
+                f.write(b"\n")
+                yield item
+
+
+def collect(items: Iterable[Video]) -> Dict[str, Any]:
+    """Materialize scraped items into the legacy {"data": [...]} shape."""
+
+    return {"data": msgspec.to_builtins(list(items))}
+
+
+def top_by_likes(
+    items: Iterable[Video], k: int = DEFAULT_TOP_K
+) -> List[Video]:
+    """Return the k most-liked items, keeping only k items in memory at a time."""
+
+    return heapq.nlargest(k, items, key=lambda item: item.likes)
+
+
+def without_text(
+    per_tag: Dict[str, Iterable[Video]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Per-hashtag videos as plain dicts for an LLM, minus each caption's full text.
+
+    The local summary already stands in for the caption, which is most of a
+    video's tokens.
+    """
+
+    records = {
+        tag: msgspec.to_builtins(list(videos)) for tag, videos in per_tag.items()
+    }
+    for videos in records.values():
+        for video in videos:
+            del video["text"]
+    return records
+
+
+@functools.lru_cache(maxsize=1)
+def _io_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread that runs every scrape made through the tool.
+
+    Keeping one loop alive lets the aiohttp session, and with it the pooled TLS
+    connections to Apify, be reused across tool calls.
+    """
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(
+        target=loop.run_forever, name="tiktok-scrape-io", daemon=True
+    ).start()
+    return loop
+
+
+async def _shared_session() -> aiohttp.ClientSession:
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession()
+    return _SESSION
+
+
+@atexit.register
+def _close_shared_session() -> None:
+    if _SESSION is not None and not _SESSION.closed:
+        asyncio.run_coroutine_threadsafe(_SESSION.close(), _io_loop()).result(5)
+
+
+def _dispatch_scrape(
+    hashtags: List[str], results_per_page: int, top_k: int
+) -> Dict[str, Tuple[Video, ...]]:
+    """Deduplicate identical scrapes requested by crews within the same process.
+
+    Results are reused for _DEDUP_TTL seconds, keyed by the set of hashtags, and
+    returned in the caller's hashtag order. A reused result can be up to the Redis
+    TTL plus _DEDUP_TTL old, since it may itself have come from the cache.
+    """
+
+    key = (frozenset(hashtags), results_per_page, top_k)
+    now = time.monotonic()
+    with _DEDUP_LOCK:
+        hit = _DEDUP.get(key)
+        if hit is not None and hit[0] > now:
+            _DEDUP.move_to_end(key)
+            per_tag = hit[1]
+        else:
+            per_tag = None
+
+    if per_tag is None:
+
+        async def _scrape() -> Dict[str, List[Video]]:
+            return await tiktok_scrape_tool_async(
+                hashtags,
+                results_per_page=results_per_page,
+                top_k=top_k,
+                session=await _shared_session(),
+            )
+
+        scraped = asyncio.run_coroutine_threadsafe(_scrape(), _io_loop()).result()
+        per_tag = {tag: tuple(videos) for tag, videos in scraped.items()}
+        with _DEDUP_LOCK:
+            _DEDUP[key] = (time.monotonic() + _DEDUP_TTL, per_tag)
+            _DEDUP.move_to_end(key)
+            while len(_DEDUP) > _DEDUP_MAXSIZE:
+                _DEDUP.popitem(last=False)
+
+    return {tag: per_tag[tag] for tag in hashtags}
 
 
 class TikTokHashtagScrapeTool(BaseTool):
@@ -93,18 +522,23 @@ class TikTokHashtagScrapeTool(BaseTool):
 
     name: str = "tiktok_hashtag_scrape"
     description: str = (
-        "Scrape TikTok posts for the given list of hashtags and return the JSON results. "
+        "Scrape TikTok posts for the given list of hashtags and return JSON of the form"
+        " {\"data\": {\"<hashtag>\": [videos]}}, with each hashtag's videos already"
+        " limited to the top_k most liked. "
         "Requires APIFY_API_TOKEN to be set."
     )
-    args_schema: type[BaseModel] = TikTokHashtagScrapeInput
+    args_schema: type[BaseModel] = TikTokHashtagScrapeArgs
+
+    def _run(self, **kwargs: Any) -> Dict[str, Any]:
+        # Defaults and bounds live on the Struct; unknown keyword arguments are ignored.
+        # Lax mode accepts what the pydantic args_schema does, e.g. "10" for an int
+        args = msgspec.convert(kwargs, TikTokHashtagScrapeInput, strict=False)
+        per_tag = _dispatch_scrape(args.hashtags, args.results_per_page, args.top_k)
+        return {"data": without_text(per_tag)}
 
-    def _run(
-        self, hashtags: List[str], results_per_page: int = 10, **_: Any
-    ) -> Dict[str, Any]:
-        return tiktok_scrape_tool(
-            hashtags=hashtags, results_per_page=results_per_page, write_to_file=False
-        )
 
+# Shared instance reused by the agent factories and workflows
+hashtag_scrape_tool: TikTokHashtagScrapeTool = TikTokHashtagScrapeTool()
 
 if __name__ == "__main__":
     import argparse
@@ -144,17 +578,22 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # Normalize and parse hashtags CSV
-    hashtags = [h.strip().lstrip("#") for h in args.hashtags.split(",") if h.strip()]
+    hashtags = normalize_hashtags(args.hashtags)
     if not hashtags:
         print("Error: --hashtags must contain at least one value.", file=sys.stderr)
         sys.exit(1)
 
     try:
-        result = tiktok_scrape_tool(
-            hashtags, results_per_page=args.results_per_page, write_to_file=True
+        result = collect(
+            tiktok_scrape_tool(
+                hashtags, results_per_page=args.results_per_page, write_to_file=True
+            )
+        )
+        print(
+            orjson.dumps(
+                result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ).decode()
         )
-        print(json.dumps(result, ensure_ascii=False, indent=2))
     except Exception as e:
         print(f"Error running scraper: {e}", file=sys.stderr)
         sys.exit(1)
-
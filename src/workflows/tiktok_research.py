@@ -1,17 +1,163 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import os
+import re
 import json
+import asyncio
+import functools
 
+import aiohttp
+import ijson
+import msgspec
+import orjson
 from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 
-from src.tools import TikTokHashtagScrapeTool
+from src.agents.llm import get_llm
+from src.tools import hashtag_scrape_tool
+from src.tools.tiktok_scrape_tool import (
+    Video,
+    normalize_hashtags,
+    tiktok_scrape_tool_async,
+    without_text,
+)
+
+
+# The hashtag prompt asks for 5-10 tags; never fan out more scrapes than that
+MAX_HASHTAGS = 10
+
+_RESULTS_INSTRUCTIONS = (
+    "For each hashtag, extract: (1) video metadata (hashtags, views, likes),"
+    " (2) top creator account details, and (3) a concise summary of the video content.\n"
+    "Aggregate everything into STRICT JSON with the following high-level shape:\n"
+    "{\n"
+    "  \"results\": {\n"
+    "    \"<hashtag>\": {\n"
+    "      \"videos\": [\n"
+    "        {\n"
+    "          \"id\": string,\n"
+    "          \"url\": string,\n"
+    "          \"hashtags\": [string],\n"
+    "          \"views\": number,\n"
+    "          \"likes\": number,\n"
+    "          \"creator\": {\n"
+    "             \"username\": string,\n"
+    "             \"nickname\": string|null,\n"
+    "             \"followers\": number|null\n"
+    "          },\n"
+    "          \"summary\": string\n"
+    "        }\n"
+    "      ]\n"
+    "    }\n"
+    "  }\n"
+    "}\n"
+    "Notes:\n"
+    "- Include every video provided.\n"
+    "- Map username/nickname/followers into 'creator'. If missing, use null.\n"
+    "- Pass through each video's 'summary' verbatim; do not re-summarize.\n"
+    "- Only output the JSON."
+)
+
+
+_VIDEO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "url": {"type": "string"},
+        "hashtags": {"type": "array", "items": {"type": "string"}},
+        "views": {"type": "number"},
+        "likes": {"type": "number"},
+        "creator": {
+            "type": "object",
+            "properties": {
+                "username": {"type": "string"},
+                "nickname": {"type": ["string", "null"]},
+                "followers": {"type": ["number", "null"]},
+            },
+            "required": ["username", "nickname", "followers"],
+        },
+        "summary": {"type": "string"},
+    },
+    "required": ["id", "url", "hashtags", "views", "likes", "creator", "summary"],
+}
+
+# OpenAI structured-output formats, by name. The results schema is keyed by
+# hashtag, which strict mode cannot express, so it only pins the JSON shape.
+_RESPONSE_FORMATS: Dict[str, Dict[str, Any]] = {
+    "hashtags": {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "Hashtags",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "hashtags": {
+                        "type": "array",
+                        "items": {"type": "string", "pattern": "^[A-Za-z0-9]+$"},
+                        "minItems": 5,
+                        "maxItems": MAX_HASHTAGS,
+                    }
+                },
+                "required": ["hashtags"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "results": {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "HashtagResults",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "results": {
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": "object",
+                            "properties": {
+                                "videos": {"type": "array", "items": _VIDEO_SCHEMA}
+                            },
+                            "required": ["videos"],
+                        },
+                    }
+                },
+                "required": ["results"],
+            },
+        },
+    },
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _structured_llm(model: str, response_format: str) -> ChatOpenAI:
+    """Shared deterministic ChatOpenAI whose replies follow a _RESPONSE_FORMATS entry."""
+
+    return ChatOpenAI(
+        model=model,
+        temperature=0,
+        model_kwargs={"response_format": _RESPONSE_FORMATS[response_format]},
+    )
+
+
+def _hashtag_prompt(trending_topics: List[str]) -> str:
+    return (
+        "From these trending topics: '" + ", ".join(trending_topics) + "'\n"
+        "Generate 5-10 TikTok-ready hashtags that are highly relevant.\n"
+        "Rules:\n"
+        "- No spaces; only letters/numbers.\n"
+        "- Do not include the leading '#'.\n"
+        "- Avoid duplicates and overly generic tags.\n"
+        "Return STRICT JSON: {\"hashtags\": [\"tag1\", \"tag2\", ...]}"
+    )
 
 
 def create_search_query_crew(
-    trending_topics: List[str], *, results_per_page: int = 10, model: str = "gpt-4o-mini"
+    trending_topics: List[str],
+    *,
+    results_per_page: int = 10,
+    model: str = "gpt-4o-mini",
 ) -> Crew:
     """Create a Crew that generates TikTok hashtags and scrapes results.
 
@@ -28,13 +174,8 @@ def create_search_query_crew(
         # Don't hard fail here; allow environments with compatible LLM routing
         pass
 
-    # Tool to scrape TikTok by hashtags
-    scrape_tool = TikTokHashtagScrapeTool()
-
     # Deterministic LLM for generation and summarization
-    llm = ChatOpenAI(model=model, temperature=0)
-
-    topics_text = ", ".join(trending_topics)
+    llm = get_llm(model, 0.0)
 
     researcher = Agent(
         role="TikTok Research Analyst",
@@ -46,22 +187,14 @@ def create_search_query_crew(
             "You specialize in social media trend analysis. You are precise with JSON and only"
             " include fields asked for."
         ),
-        tools=[scrape_tool],
+        tools=[hashtag_scrape_tool],
         llm=llm,
         allow_delegation=False,
         verbose=False,
     )
 
     hashtag_task = Task(
-        description=(
-            "From these trending topics: '" + topics_text + "'\n"
-            "Generate 5-10 TikTok-ready hashtags that are highly relevant.\n"
-            "Rules:\n"
-            "- No spaces; only letters/numbers.\n"
-            "- Do not include the leading '#'.\n"
-            "- Avoid duplicates and overly generic tags.\n"
-            "Return STRICT JSON: {\"hashtags\": [\"tag1\", \"tag2\", ...]}"
-        ),
+        description=_hashtag_prompt(trending_topics),
         agent=researcher,
         expected_output=(
             "A compact JSON object with a single key 'hashtags' containing 5-10 items."
@@ -71,36 +204,12 @@ def create_search_query_crew(
     scrape_task = Task(
         description=(
             "Using the hashtags from the previous task, call the 'tiktok_hashtag_scrape' tool"
-            f" with results_per_page={results_per_page}.\n"
-            "For each hashtag, extract: (1) video metadata (hashtags, views, likes),"
-            " (2) top creator account details, and (3) a concise summary of the video content.\n"
-            "Aggregate everything into STRICT JSON with the following high-level shape:\n"
-            "{\n"
-            "  \"results\": {\n"
-            "    \"<hashtag>\": {\n"
-            "      \"videos\": [\n"
-            "        {\n"
-            "          \"id\": string,\n"
-            "          \"url\": string,\n"
-            "          \"hashtags\": [string],\n"
-            "          \"views\": number,\n"
-            "          \"likes\": number,\n"
-            "          \"creator\": {\n"
-            "             \"username\": string,\n"
-            "             \"nickname\": string|null,\n"
-            "             \"followers\": number|null\n"
-            "          },\n"
-            "          \"summary\": string\n"
-            "        }\n"
-            "      ]\n"
-            "    }\n"
-            "  }\n"
-            "}\n"
-            "Notes:\n"
-            "- If the tool returns many items, include at least the top 5 by likes.\n"
-            "- Infer creator and counts from the tool output fields when present. If missing, use null.\n"
-            "- The 'summary' must be 1-2 sentences distilled from title/description/captions.\n"
-            "- Only output the JSON."
+            f" once with all of them and results_per_page={results_per_page}"
+            " (the tool scrapes each hashtag concurrently).\n"
+            "The tool returns {\"data\": {\"<hashtag>\": [videos]}}, already limited to the"
+            " most-liked videos per hashtag. Each video has id, url, hashtags, views, likes,"
+            " username, nickname, followers and summary.\n"
+            + _RESULTS_INSTRUCTIONS
         ),
         agent=researcher,
         context=[hashtag_task],
@@ -112,6 +221,142 @@ def create_search_query_crew(
     return Crew(agents=[researcher], tasks=[hashtag_task, scrape_task])
 
 
+async def stream_hashtags_and_scrape(
+    trending_topics: List[str], *, results_per_page: int = 10, model: str = "gpt-4o-mini"
+) -> Tuple[List[str], Dict[str, List[Video]], List[str]]:
+    """Generate hashtags with a streaming LLM call and scrape each one as it arrives.
+
+    The JSON response is parsed incrementally, so the scrape for a hashtag starts as
+    soon as the model has emitted it instead of after the whole response.
+
+    Returns (hashtags, videos per successfully scraped hashtag, failed hashtags).
+    """
+
+    llm = _structured_llm(model, "hashtags")
+    events = ijson.sendable_list()
+    parser = ijson.items_coro(events, "hashtags.item")
+
+    hashtags: List[str] = []
+    scrapes: List[asyncio.Task] = []
+    async with aiohttp.ClientSession() as session:
+
+        def _dispatch(raw: Any) -> None:
+            for tag in normalize_hashtags([raw]):
+                if tag not in hashtags and len(hashtags) < MAX_HASHTAGS:
+                    hashtags.append(tag)
+                    scrapes.append(
+                        asyncio.create_task(
+                            tiktok_scrape_tool_async(
+                                [tag], results_per_page=results_per_page, session=session
+                            )
+                        )
+                    )
+
+        try:
+            async for chunk in llm.astream(_hashtag_prompt(trending_topics)):
+                parser.send(str(chunk.content).encode("utf-8"))
+                for raw in events:
+                    _dispatch(raw)
+                del events[:]
+            parser.close()
+            for raw in events:
+                _dispatch(raw)
+
+            # A failed hashtag (e.g. a FAILED actor run) must not discard the rest
+            results = await asyncio.gather(*scrapes, return_exceptions=True)
+        except BaseException:
+            for scrape in scrapes:
+                scrape.cancel()
+            # Let the cancelled scrapes unwind before the session closes
+            await asyncio.gather(*scrapes, return_exceptions=True)
+            raise
+
+    per_tag: Dict[str, List[Video]] = {}
+    failed: List[str] = []
+    for tag, result in zip(hashtags, results):
+        if isinstance(result, BaseException):
+            failed.append(tag)
+        else:
+            per_tag.update(result)
+    return hashtags, per_tag, failed
+
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def _outermost_object(s: str) -> Optional[str]:
+    """Return the first balanced top-level {...} in s, ignoring braces inside strings."""
+
+    start = s.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return s[start : i + 1]
+    return None
+
+
+def _extract_json(s: str) -> Optional[Dict[str, Any]]:
+    """Parse a JSON object out of LLM output that may add code fences or prose."""
+
+    fenced = _CODE_FENCE.search(s)
+    if fenced:
+        s = fenced.group(1)
+    candidate = _outermost_object(s)
+    if candidate is None:
+        return None
+    try:
+        parsed = orjson.loads(candidate)
+    except orjson.JSONDecodeError:
+        # orjson rejects a few inputs stdlib accepts, e.g. lone surrogates
+        try:
+            parsed = json.loads(candidate)
+        except ValueError:
+            return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def assemble_results(
+    scraped: Dict[str, List[Video]], *, model: str = "gpt-4o-mini"
+) -> Optional[Dict[str, Any]]:
+    """Turn pre-scraped videos into the results JSON with one structured-output call.
+
+    No tools are involved, so the LLM is called directly rather than through a
+    crew, whose agent would drop response_format and expect a ReAct-style answer.
+    Returns None if the reply has no parsable 'results' object.
+    """
+
+    prompt = (
+        "These TikTok videos were scraped per hashtag, already limited to the"
+        " most-liked videos per hashtag:\n"
+        + msgspec.json.encode(without_text(scraped)).decode()
+        + "\n"
+        + _RESULTS_INSTRUCTIONS
+    )
+    reply = _structured_llm(model, "results").invoke(prompt)
+    parsed = _extract_json(str(reply.content))
+    if not parsed or not isinstance(parsed.get("results"), dict):
+        return None
+    return parsed
+
+
 def run_search_query_agent(
     trending_topics: List[str], *, results_per_page: int = 10, model: str = "gpt-4o-mini"
 ) -> Dict[str, Any]:
@@ -119,50 +364,37 @@ def run_search_query_agent(
 
     Returns a dict with structure:
       {
-        "hashtags": ["..."],  # From the first task when parsable
-        "results": { ... }     # From the scrape task
+        "hashtags": ["..."],  # From the streamed hashtag generation step
+        "results": { ... },    # From the structured-output assembly step
+        "failed": ["..."]      # Hashtags whose scrape failed; left out of results
       }
     """
 
-    crew = create_search_query_crew(
-        trending_topics, results_per_page=results_per_page, model=model
+    # Hashtag generation streams into the scrapes; only assembly is left afterwards
+    hashtags, scraped, failed = asyncio.run(
+        stream_hashtags_and_scrape(
+            trending_topics, results_per_page=results_per_page, model=model
+        )
     )
-    raw = crew.kickoff()
+    if not hashtags:
+        # Nothing was scraped, so there is nothing to assemble
+        return {"hashtags": [], "error": "No usable hashtags were generated"}
+    if not scraped:
+        return {
+            "hashtags": hashtags,
+            "failed": failed,
+            "error": "Every hashtag scrape failed",
+        }
 
-    # Crew usually returns a string; attempt to parse.
-    def _safe_json_loads(s: str) -> Optional[Dict[str, Any]]:
-        try:
-            return json.loads(s)
-        except Exception:
-            return None
-
-    parsed = None
-    if isinstance(raw, str):
-        parsed = _safe_json_loads(raw)
-    elif isinstance(raw, dict):
-        parsed = raw
-
-    # If the final output didn't include hashtags, try to parse from first task result
-    if not parsed or "results" not in parsed:
-        # Try to fetch intermediate artifacts if available
-        try:
-            artifacts = crew.artifacts  # type: ignore[attr-defined]
-        except Exception:
-            artifacts = None
-
-        output: Dict[str, Any] = {}
-        if parsed:
-            output.update(parsed)
-        if artifacts and isinstance(artifacts, dict):
-            for v in artifacts.values():
-                if isinstance(v, str):
-                    maybe = _safe_json_loads(v)
-                    if maybe and "hashtags" in maybe and "hashtags" not in output:
-                        output["hashtags"] = maybe["hashtags"]
-        return output or {"error": "Could not parse crew output"}
-
-    return parsed
+    parsed = assemble_results(scraped, model=model)
+    if parsed is None:
+        return {
+            "hashtags": hashtags,
+            "failed": failed,
+            "error": "Could not parse LLM output",
+        }
 
+    return {"hashtags": hashtags, "results": parsed["results"], "failed": failed}
 
 if __name__ == "__main__":
     import argparse
@@ -192,4 +424,4 @@ if __name__ == "__main__":
     data = run_search_query_agent(
         topics, results_per_page=args.results_per_page, model=args.model
     )
-    print(json.dumps(data, ensure_ascii=False, indent=2))
+    print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
@@ -0,0 +1,83 @@
+import fakeredis
+import pytest
+
+from src.tools import scrape_cache
+
+# Start of a window, so tests can move within and across windows predictably
+T0 = 1_000_000 * scrape_cache.BUCKET_WINDOW
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(scrape_cache, "_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [float(T0)]
+    monkeypatch.setattr(scrape_cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize("compress", ["1", "0"])
+def test_round_trip(client, clock, monkeypatch, compress):
+    monkeypatch.setenv("COMPRESS_RESULTS", compress)
+    scrape_cache.set_cached({"Cats": [{"id": "1"}]}, 10)
+    assert scrape_cache.get_cached(["cats", "dogs"], 10) == {"cats": [{"id": "1"}]}
+    assert scrape_cache.get_cached(["cats"], 20) == {}
+
+
+def test_entry_expires_after_its_own_ttl(client, clock):
+    scrape_cache.set_cached({"cats": [{"id": "1"}]}, 10, ttl=60)
+    clock[0] += 59
+    assert scrape_cache.get_cached(["cats"], 10)
+    clock[0] += 2
+    assert scrape_cache.get_cached(["cats"], 10) == {}
+
+
+def test_entry_from_previous_window_is_still_served(client, clock):
+    clock[0] += scrape_cache.BUCKET_WINDOW - 10
+    scrape_cache.set_cached({"cats": [{"id": "1"}]}, 10)
+    clock[0] += 20
+    assert scrape_cache.get_cached(["cats"], 10) == {"cats": [{"id": "1"}]}
+
+
+def test_ttl_is_capped_at_one_window(client, clock):
+    ttl = 10 * scrape_cache.BUCKET_WINDOW
+    scrape_cache.set_cached({"cats": [{"id": "1"}]}, 10, ttl=ttl)
+    clock[0] += scrape_cache.BUCKET_WINDOW + 1
+    assert scrape_cache.get_cached(["cats"], 10) == {}
+
+
+def test_bucket_expires_at_the_end_of_the_next_window(client, clock):
+    clock[0] += 100
+    scrape_cache.set_cached({"cats": [{"id": "1"}]}, 10)
+    key = scrape_cache.bucket_key(10, 1_000_000)
+    assert client.expiretime(key) == T0 + 2 * scrape_cache.BUCKET_WINDOW
+
+    # Later writes to the same window do not push the expiry back
+    clock[0] += 1000
+    scrape_cache.set_cached({"dogs": [{"id": "2"}]}, 10)
+    assert client.expiretime(key) == T0 + 2 * scrape_cache.BUCKET_WINDOW
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        b"\x28\xb5\x2f\xfd truncated",
+        b"[1, 2]",
+        b'{"expires_at": "soon"}',
+        b'{"expires_at": 1e12, "items": [1]}',
+    ],
+)
+def test_unreadable_entries_are_misses(client, clock, value):
+    client.hset(scrape_cache.bucket_key(10, 1_000_000), "cats", value)
+    assert scrape_cache.get_cached(["cats"], 10) == {}
+
+
+def test_disabled_without_redis(monkeypatch):
+    monkeypatch.setattr(scrape_cache, "_redis", lambda: None)
+    scrape_cache.set_cached({"cats": []}, 10)
+    assert scrape_cache.get_cached(["cats"], 10) == {}
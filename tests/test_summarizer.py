@@ -0,0 +1,40 @@
+from src.tools.summarizer import MAX_SUMMARY_CHARS, summarize
+
+
+def test_inline_tags_keep_their_words():
+    assert summarize("I love #cats and #dogs") == "I love cats and dogs"
+    assert summarize("I love #cats") == "I love cats"
+
+
+def test_trailing_tag_block_is_dropped():
+    assert summarize("Fun day at the beach #summer #beach @friend") == (
+        "Fun day at the beach"
+    )
+    assert summarize("Great day! #fun") == "Great day!"
+
+
+def test_sigils_inside_words_are_left_alone():
+    assert summarize("email me@x.com ok") == "email me@x.com ok"
+    assert summarize("issue c#1 fixed") == "issue c#1 fixed"
+
+
+def test_tags_only_caption_falls_back_to_tag_words():
+    assert summarize("#cats #dogs") == "cats dogs"
+    assert summarize(" #solo ") == "solo"
+
+
+def test_urls_dropped_and_sentences_limited():
+    text = "Watch this https://example.com/v now. Second one! Third."
+    assert summarize(text) == "Watch this now. Second one!"
+    assert summarize(text, max_sentences=1) == "Watch this now."
+
+
+def test_long_summary_is_truncated_on_a_word_boundary():
+    summary = summarize("word " * 100)
+    assert len(summary) <= MAX_SUMMARY_CHARS + 1
+    assert summary.endswith("word…")
+
+
+def test_empty_caption():
+    assert summarize("") == ""
+    assert summarize("https://example.com") == ""
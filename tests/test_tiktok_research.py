@@ -0,0 +1,32 @@
+from src.workflows.tiktok_research import _extract_json, _outermost_object
+
+
+def test_outermost_object_skips_surrounding_prose():
+    assert _outermost_object('Sure! {"a": {"b": 1}} Hope this helps {"c": 2}') == (
+        '{"a": {"b": 1}}'
+    )
+
+
+def test_outermost_object_ignores_braces_in_strings():
+    s = r'{"text": "a } and a { and an escaped \" }"}'
+    assert _outermost_object("x " + s + " y") == s
+
+
+def test_outermost_object_unbalanced_or_missing():
+    assert _outermost_object('{"a": 1') is None
+    assert _outermost_object("no json here") is None
+
+
+def test_extract_json_from_code_fence():
+    reply = 'Here you go:\n```json\n{"results": {"cats": {"videos": []}}}\n```'
+    assert _extract_json(reply) == {"results": {"cats": {"videos": []}}}
+
+
+def test_extract_json_from_bare_object():
+    assert _extract_json('{"hashtags": ["a", "b"]}') == {"hashtags": ["a", "b"]}
+
+
+def test_extract_json_rejects_invalid_or_non_objects():
+    assert _extract_json("{not json}") is None
+    assert _extract_json('["a", "b"]') is None
+    assert _extract_json("") is None
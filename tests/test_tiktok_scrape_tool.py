@@ -0,0 +1,36 @@
+import msgspec
+import pytest
+
+from src.tools.tiktok_scrape_tool import TikTokHashtagScrapeInput, normalize_hashtags
+
+
+def test_normalize_hashtags_from_string():
+    assert normalize_hashtags(" #Cats, dogs,,#cats ") == ["cats", "dogs"]
+
+
+def test_normalize_hashtags_keeps_first_occurrence_order():
+    assert normalize_hashtags(["b", "#A", "a", "B", "c"]) == ["b", "a", "c"]
+
+
+def test_normalize_hashtags_drops_non_alphanumeric_tags():
+    assert normalize_hashtags(["ok1", "not ok", "no-dash", "", "#"]) == ["ok1"]
+
+
+def test_normalize_hashtags_rejects_other_types():
+    with pytest.raises(ValueError):
+        normalize_hashtags(42)
+
+
+def test_scrape_input_normalizes_and_coerces():
+    args = msgspec.convert(
+        {"hashtags": "#Cats,dogs", "results_per_page": "20"},
+        TikTokHashtagScrapeInput,
+        strict=False,
+    )
+    assert args.hashtags == ["cats", "dogs"]
+    assert args.results_per_page == 20
+
+
+def test_scrape_input_requires_a_usable_tag():
+    with pytest.raises(msgspec.ValidationError):
+        msgspec.convert({"hashtags": ["not ok"]}, TikTokHashtagScrapeInput)